@@ -16,15 +16,47 @@ import threading
 import time
 import struct
 import os
+import re
+import shutil
 import sys
 import logging
 from pathlib import Path
 import json
-import requests
+import pickle
+from collections import deque
+from collections.abc import MutableMapping
+from urllib.request import urlopen
+
+# json (de)serializing works on bytes, using orjson if installed (much faster), or else the standard json module.
+# Both write the same output, so the config file does not change format depending on what is installed.
+try:
+    import orjson
+
+    def json_loads(data: bytes):
+        return orjson.loads(data)
+
+    def json_dumps(obj, default=None) -> bytes:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    def json_loads(data: bytes):
+        return json.loads(data)
+
+    def json_dumps(obj, default=None) -> bytes:
+        return json.dumps(obj, default=default, indent=2, ensure_ascii=False).encode("utf-8")
 
 RELAX_PROMPT = "Relax"
 
+# Keys of each option in the json config file, shared by every option dict written on save.
+OPTION_JSON_KEYS = ("Option type", "Explanation", "Relax Time (secs)", "Action Time (secs)", "Loop times")
+
 class TestOption:
+    __slots__ = ('name', 'explanation', 'action_time', 'relax_time', 'loop_times', '_vals_cache')
+
+    # Detail labels shown in the settings window, and the attribute each one displays (same order).
+    LABELS = ('Opt. Name', 'Explanation', 'Action Time (sec)', 'Relax Time (sec)', 'Loop Count')
+    ATTRS = ('name', 'explanation', 'action_time', 'relax_time', 'loop_times')
+
     def __init__(self, option_name='INIT', explanation='', relax_time=0, action_time=0, loop_times=0):
         self.name = option_name
         self.explanation = explanation
@@ -32,24 +64,34 @@ class TestOption:
         self.action_time = action_time 
         self.relax_time = relax_time 
         self.loop_times = loop_times 
+
+        self._vals_cache = None # Built by get_vals, reset by update_vals.
     
     def update_vals(self, explanation='', action_time=-1, relax_time=-1, loop_times=-1):
         self.explanation = explanation if explanation != '' else self.explanation
 
-        self.action_time = float(action_time) if float(action_time) >= 0 else self.action_time
-        self.relax_time = float(relax_time) if float(relax_time) >= 0 else self.relax_time
-        self.loop_times = int(loop_times) if int(loop_times) >= 0 else self.loop_times
+        # Convert each value once; the settings window already passes numbers (from its DoubleVar/IntVar fields).
+        action_time = action_time if type(action_time) is float else float(action_time)
+        relax_time = relax_time if type(relax_time) is float else float(relax_time)
+        loop_times = loop_times if type(loop_times) is int else int(loop_times)
+
+        # Negative values mean 'keep the current value'.
+        self.action_time = action_time if action_time >= 0 else self.action_time
+        self.relax_time = relax_time if relax_time >= 0 else self.relax_time
+        self.loop_times = loop_times if loop_times >= 0 else self.loop_times
+
+        self._vals_cache = None
     
+    # Returns a cached tuple of (attr, label, value) triples; treat it as read-only.
     def get_vals(self):
-        return [
-        ('Opt. Name', self.name),
-        ('Explanation', self.explanation),
-        ('Action Time (sec)', self.action_time),
-        ('Relax Time (sec)', self.relax_time),
-        ('Loop Count', self.loop_times)
-    ]
+        if self._vals_cache is None:
+            self._vals_cache = tuple(zip(self.ATTRS, self.LABELS, (getattr(self, attr) for attr in self.ATTRS)))
+
+        return self._vals_cache
 
 class Test:
+    __slots__ = ('name', 'action_prompt', 'options')
+
     def __init__(self, action_name: str, action_prompt: str):
         self.name = action_name
         self.action_prompt = action_prompt 
@@ -74,14 +116,11 @@ class Test:
         newOpt = TestOption(option_name=option_name, explanation=explanation, action_time=action_time, relax_time=relax_time, loop_times=loop_times)
         return self.add_opt(newOpt)
     
-    def delete_option(self, option):
-        option_name = option if isinstance(option, str) else option.name if isinstance(option, TestOption) else None
+    def delete_option_by_name(self, option_name: str):
+        return self.options.pop(option_name, None) is not None # True if the option existed.
 
-        if option_name in self.options:
-            del self.options[option_name]
-            return True
-        
-        return False
+    def delete_option_obj(self, option: TestOption):
+        return self.delete_option_by_name(option.name)
     
     def update_option(self, option_name, explanation='', relax_time=-1, action_time=-1, loop_times=-1):
         if option_name in self.options:
@@ -93,6 +132,58 @@ class Test:
     def get_option(self, option_name: str) -> TestOption:
         return self.options.get(option_name, None)
 
+    @classmethod
+    def from_json(cls, test_name: str, test_data: dict):
+        test = cls(test_name, test_data['Action Prompt']) # Create the new Test.
+
+        for option in test_data["options"]: 
+            # Add the current option to the current Test's 'options' map.
+            test.add_option(option_name=option["Option type"], explanation=option["Explanation"], 
+                            action_time=option["Action Time (secs)"], relax_time=option["Relax Time (secs)"], loop_times=option["Loop times"])
+
+        return test
+
+class LazyTests(MutableMapping):
+    """
+    Dictionary mapping Test.name (str) to Test.
+    Tests are kept as their raw json data until first accessed,
+    so tests that are never opened are never built.
+    """
+
+    def __init__(self, raw=None):
+        self._entries = raw if raw is not None else {} # Maps test_name to a Test, or to its raw json data.
+
+    def __getitem__(self, test_name):
+        entry = self._entries[test_name]
+
+        if not isinstance(entry, Test): # First access: build the Test and cache it in place of the raw data.
+            entry = Test.from_json(test_name, entry)
+            self._entries[test_name] = entry
+
+        return entry
+
+    def __setitem__(self, test_name, test):
+        self._entries[test_name] = test
+
+    def __delitem__(self, test_name):
+        del self._entries[test_name]
+
+    def pop(self, test_name, *default):
+        return self._entries.pop(test_name, *default) # Does not build the Test (MutableMapping.pop would).
+
+    def __contains__(self, test_name):
+        return test_name in self._entries # Does not build the Test.
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entries(self):
+        # (test_name, Test or raw json data) pairs, without building any Tests.
+        return self._entries.items()
+
 class TestSettings:
     """
     For multiple timing options for a single test.
@@ -102,11 +193,36 @@ class TestSettings:
             option 2: Single 4 secs timing
     """
 
-    def __init__(self, dir: str, root):
+    # Numeric option details (by TestOption attribute) are edited in an Entry backed by a Tk variable,
+    # so their value is read back already typed.
+    NUMERIC_DETAILS = {
+        'action_time': tk.DoubleVar,
+        'relax_time': tk.DoubleVar,
+        'loop_times': tk.IntVar,
+    }
+
+    def __init__(self, dir: str, root, on_load=None):
         self.root = root
 
-        self.all_tests = {} # Dicctionary mapping Test.name (str) to Test 
-        self.load_from_json(dir=dir)
+        self.all_tests = LazyTests() # Dicctionary mapping Test.name (str) to Test 
+        self.first_options = {} # Maps Test.name (str) to its first option's name. Filled by first_option.
+
+        # Edits are saved in batches (see save_to_json).
+        self.dirty = False
+        self.flush_after_id = None
+
+        # Test settings window views, built once and then reused when navigating (see show_view).
+        self.shown_view = None
+        self.all_tests_view = None
+        self.options_views = {} # Maps test_name (str) to (view, details_content_frame).
+        self.test_settings_window = None
+
+        # Config loading (see load_from_json). Settings stay disabled until the loaded tests are in all_tests,
+        # since replacing all_tests would throw away any test created before then.
+        self.config_loaded = False
+        self.load_results = deque() # Filled by the loading thread, emptied on the Tk main loop.
+
+        self.load_from_json(dir=dir, on_load=on_load)
 
         self.top_frame = tk.Frame(self.root)
         self.top_frame.pack(side=tk.TOP, padx=10, pady=10)
@@ -131,100 +247,227 @@ class TestSettings:
         # Help (TDB)
         help_menu = Menu(self.menubar, tearoff=0)
         self.menubar.add_cascade(label="Help", menu=help_menu)
+
+        self.disable_settings() # Until the config is loaded (see apply_loaded_config).
     
     def show_instructions(self):
         pass
 
-    def load_json(self, filename, dir=None, max_download_attempts=1):
-        # Change to directory that contains config file.
-        if dir is not None:
-            os.chdir(dir)
-
-        # Load the json config file.
+    # Absolute path of the json config file: filename (with or without '.json'), inside dir if given.
+    # Absolute, so later saves (self.filename) don't depend on the working directory at that time.
+    def config_path(self, filename, dir=None):
         json_filename = filename if filename.endswith('.json') else filename + '.json'
+        return os.path.abspath(os.path.join(dir, json_filename) if dir else json_filename)
+
+    def load_json(self, filename, dir=None, max_download_attempts=1):
+        # Load the json config file. Joined onto dir, rather than changing the whole process's working directory.
+        json_filename = self.config_path(filename=filename, dir=dir)
         
-        for _ in range(max_download_attempts + 1): 
+        # One open per attempt; download only between attempts, so the last failed open doesn't trigger a wasted download.
+        for attempt in range(max_download_attempts + 1): 
             try:
-                with open(json_filename, 'r', encoding="utf-8") as file:
-                    data = json.load(file)
+                data = self.load_cached_json(json_filename)
                 
                 self.filename = json_filename
                 return data
 
             except FileNotFoundError:
+                if attempt == max_download_attempts:
+                    return None # On failure (after reaching allowed attempt count).
+
                 self.download_config_file(json_filename)
-        
-        return None # On failure (after reaching allowed attempt count).
+
+    def load_cached_json(self, json_filename):
+        """
+        Returns the parsed json data.
+        Reuses the pickled copy next to the json file if the json file has not changed since it was cached.
+        """
+        stat = os.stat(json_filename) # Raises FileNotFoundError if the config file is missing.
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        json_dir, json_basename = os.path.split(json_filename)
+        cache_filename = os.path.join(json_dir, f".{os.path.splitext(json_basename)[0]}.cache.pkl")
+
+        try:
+            with open(cache_filename, 'rb') as cache:
+                cached_stamp, data = pickle.load(cache)
+
+            if cached_stamp == stamp:
+                return data
+
+        except Exception: # Missing or unreadable cache, so parse the json file instead.
+            pass
+
+        data = json_loads(Path(json_filename).read_bytes())
+
+        try:
+            with open(cache_filename, 'wb') as cache:
+                pickle.dump((stamp, data), cache, protocol=pickle.HIGHEST_PROTOCOL)
+
+        except OSError as e:
+            logging.warning(f"Could not write config cache '{cache_filename}': {e}")
+
+        return data
     
-    def load_from_json(self, filename="experiment_config", dir=None, max_download_attempts=1):
-        data = self.load_json(filename=filename, dir=dir, max_download_attempts=max_download_attempts)
+    def load_from_json(self, filename="experiment_config", dir=None, max_download_attempts=1, on_load=None):
+        """
+        Loads (downloading it first, if missing) the config file on a worker thread, so the GUI is not blocked.
+        all_tests is then updated on the Tk main thread, after which on_load() is called (even if loading failed).
+        Call from the Tk main thread.
+        """
+        threading.Thread(
+            target=self.load_in_background, 
+            args=(filename, dir, max_download_attempts), 
+            daemon=True
+        ).start()
+
+        # The worker can't call into Tk itself (root.after from another thread fails if mainloop hasn't started yet),
+        # so the main loop polls for its result.
+        self.root.after(50, lambda: self.poll_loaded_config(on_load=on_load))
+    
+    # Runs on a worker thread, so must not touch any widgets: the result is handed back through load_results.
+    def load_in_background(self, filename, dir, max_download_attempts):
+        try:
+            data = self.load_json(filename=filename, dir=dir, max_download_attempts=max_download_attempts)
+
+        except Exception as e:
+            logging.error(f"\n{e}\n\nload_json failed.\n\n")
+            data = None
+
+        self.load_results.append(data) # deque append is thread-safe.
+
+    def poll_loaded_config(self, on_load):
+        if self.load_results:
+            self.apply_loaded_config(data=self.load_results.popleft(), on_load=on_load)
 
+        else:
+            self.root.after(50, lambda: self.poll_loaded_config(on_load=on_load))
+
+    def apply_loaded_config(self, data, on_load):
         if data is None:
-            return False
+            logging.error("Could not load the config file; no tests are available.")
+
+        else:
+            # Update the script's datasctructures, using the data from the json config file.
+            # Each Test is only built once it is first accessed.
+            self.all_tests = LazyTests(data)
+            self.first_options = {}
 
-        # Update the script's datasctructures, using the data from the json config file. 
-        for test_name, test_data in data.items():
-            test = Test(test_name, test_data['Action Prompt']) # Create the new Test.
+            # The test settings window may have been opened while loading.
+            if self.test_settings_window is not None and self.test_settings_window.winfo_exists():
+                self.show_all_tests()
 
-            for option in test_data["options"]: 
-                # Add the current option to the current Test's 'options' map.
-                test.add_option(option_name=option["Option type"], explanation=option["Explanation"], 
-                                action_time=option["Action Time (secs)"], relax_time=option["Relax Time (secs)"], loop_times=option["Loop times"])
-                        
-            self.all_tests[test_name] = test # Add the new Test to all_tests.
+        self.config_loaded = True
+        self.enable_settings()
+
+        if on_load is not None:
+            on_load()
 
-        return True
-    
     def download_config_file(self, filename):
         url = 'https://github.com/UW-Stroke-Rehab/Data-Collection/main/experiment_config.json'
-        response = requests.get(url)
 
-        if response.status_code == 200:
-            with open(filename, 'wb') as file:
-                file.write(response.content)
+        # Stream the response straight to disk, rather than holding the whole body in memory.
+        # urlopen raises an HTTPError for error responses.
+        with urlopen(url, timeout=10) as response:
+            if response.status == 200:
+                # Into a temp file first: a dropped connection must not leave a truncated config file,
+                # which would then fail to parse on every launch instead of being downloaded again.
+                tmp_filename = f"{filename}.tmp"
+                try:
+                    with open(tmp_filename, 'wb') as file:
+                        shutil.copyfileobj(response, file, 64 * 1024)
 
-        else:
-            raise Exception(f"Failed to download config file from {url}.")
+                    os.replace(tmp_filename, filename)
+
+                except:
+                    self.remove_temp_file(tmp_filename) # Don't leave a partial download next to the config file.
+                    raise
+
+            else:
+                raise Exception(f"Failed to download config file from {url}.")
+
+    # Removes a temp file left by a failed write, if there is one.
+    @staticmethod
+    def remove_temp_file(tmp_filename):
+        try:
+            os.remove(tmp_filename)
+        except OSError: # Never created, or already replaced the real file.
+            pass
+
+    # Save updated all_tests value into JSON file, once no other edit has been made for delay_ms.
+    # Edits made in quick succession are written together, in one flush_to_disk.
+    def save_to_json(self, delay_ms=500):
+        self.dirty = True
+
+        if self.flush_after_id is not None:
+            self.root.after_cancel(self.flush_after_id)
+
+        self.flush_after_id = self.root.after(delay_ms, self.flush_if_dirty)
+
+    # Save pending edits now. Also called when the window is closing.
+    def flush_if_dirty(self):
+        if self.flush_after_id is not None:
+            self.root.after_cancel(self.flush_after_id)
+            self.flush_after_id = None
+
+        if self.dirty:
+            self.dirty = not self.flush_to_disk() # Stay dirty on failure, so the next flush retries.
+
+    # json/orjson 'default' hook: converts the custom objects in all_tests as they are serialized.
+    @staticmethod
+    def json_default(obj):
+        if isinstance(obj, LazyTests):
+            return dict(obj.entries()) # Tests that were never accessed are still their raw json data.
+
+        if isinstance(obj, Test):
+            return {
+                "Action Prompt": obj.action_prompt,
+                "options": list(obj.options.values())
+            }
+
+        if isinstance(obj, TestOption):
+            return dict(zip(OPTION_JSON_KEYS, (obj.name, obj.explanation, obj.relax_time, obj.action_time, obj.loop_times)))
+
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    # Write all_tests into the JSON file now.
+    def flush_to_disk(self):
+        tmp_filename = None
 
-    # Save updated all_tests value into JSON file
-    def save_to_json(self):
         try:
-            serializable_tests = {} # Custom objects need to be converted to serializable dictionaries.
-            for test_name, test in self.all_tests.items():
-                serializable_test = {
-                    "Action Prompt": test.action_prompt,
-                    "options": [
-                        {
-                            "Option type": option.name,
-                            "Explanation": option.explanation,
-                            "Relax Time (secs)": option.relax_time,
-                            "Action Time (secs)": option.action_time,
-                            "Loop times": option.loop_times
-                        } for option in test.options.values()
-                    ]
-                }
-                serializable_tests[test_name] = serializable_test
-
-            # Save the serializable data to the JSON file
-            with open(self.filename, "w") as f:
-                json.dump(serializable_tests, f, indent=4) 
+            # Write to a temp file first, so a failed save can not leave the config file half-written.
+            tmp_filename = f"{self.filename}.tmp"
+
+            Path(tmp_filename).write_bytes(json_dumps(self.all_tests, default=self.json_default))
+
+            os.replace(tmp_filename, self.filename)
 
         except Exception as e:
-            logging.error(f"\n{e}\n\nsave_to_json failed.\n\n")
+            logging.error(f"\n{e}\n\nflush_to_disk failed.\n\n")
+
+            if tmp_filename is not None:
+                self.remove_temp_file(tmp_filename)
             return False
         
         return True
 
-    def delete_test(self, test):
-        test_name = test if isinstance(test, str) else test.name if isinstance(test, Test) else None
+    # Name of the test's first option (its default option), or '' if it has none.
+    def first_option(self, test_name: str):
+        if test_name not in self.first_options:
+            self.first_options[test_name] = next(iter(self.all_tests[test_name].options), "")
+
+        return self.first_options[test_name]
 
+    def delete_test(self, test_name: str):
         if test_name in self.all_tests:
             confirmed = messagebox.askyesno("Confirmation", f"Are you sure you want to delete the Test '{test_name}'?")
 
             if confirmed:
-                del self.all_tests[test_name]
+                self.all_tests.pop(test_name, None)
+                self.first_options.pop(test_name, None)
 
                 self.save_to_json()
+                self.forget_options_view(test_name=test_name)
                 self.show_all_tests()
                 return True
         
@@ -239,33 +482,41 @@ class TestSettings:
         action_time=0,
         loop_times=0,
     ):
+        test = self.all_tests[test_name]
+
         if option_title is None:
-            option_title = f"opt{(len(self.all_tests[test_name].options)) + 1}"
+            option_title = f"opt{(len(test.options)) + 1}"
 
         # Udate data structure, then the json file.
-        self.all_tests[test_name].add_option(option_name=option_title, explanation=explanation, action_time=action_time, relax_time=relax_time, loop_times=loop_times)
+        test.add_option(option_name=option_title, explanation=explanation, action_time=action_time, relax_time=relax_time, loop_times=loop_times)
+        self.first_options.pop(test_name, None)
         self.save_to_json()
 
         # Update screen
+        self.forget_options_view(test_name=test_name)
         self.show_options(test_name=test_name)
 
     def delete_option(self, test_name, option_name, delete_empty_test=True):
-        if (test_name not in self.all_tests):
+        test = self.all_tests.get(test_name)
+        if test is None:
             logging.warning(f"Cannot delete option from non-existing test '{test_name}'.")
+            return False
 
         confirmed = messagebox.askyesno("Confirmation", f"Are you sure you want to delete the Option '{option_name}' from the Test '{test_name}'?")
         if not confirmed:
             return False
 
-        test = self.all_tests[test_name]
-        test.delete_option(option_name)
+        test.delete_option_by_name(option_name)
+        self.first_options.pop(test_name, None)
 
         if test.empty(): # No need to store a test that has no options. 
-            self.delete_test(test=test_name)
+            self.delete_test(test_name=test_name)
 
         self.save_to_json()
 
         # Update display
+        self.forget_options_view(test_name=test_name)
+
         if delete_empty_test and test.empty():
             self.show_all_tests()
         else:
@@ -298,12 +549,19 @@ class TestSettings:
         self.all_tests[test_name] = new_test
 
         if option_title is not None:
-            self.all_tests[test_name].options[option_title] = TestOption(option_name=option_title, explanation=explanation, action_time=action_time, relax_time=relax_time, loop_times=loop_times)
+            new_test.options[option_title] = TestOption(option_name=option_title, explanation=explanation, action_time=action_time, relax_time=relax_time, loop_times=loop_times)
 
         # Save updated values into JSON file
-        return self.save_to_json()
+        self.save_to_json()
+        return True
 
     def open_test_settings_window(self, width=400, height=600):
+        # Only one settings window: the shared details canvas and cached views belong to it.
+        if self.test_settings_window is not None and self.test_settings_window.winfo_exists():
+            self.test_settings_window.lift()
+            self.test_settings_window.focus_set()
+            return
+
         self.test_settings_window = tk.Toplevel(self.root)
         self.test_settings_window.geometry(f"{width}x{height}")
         self.test_settings_window.resizable(False, False)  # Make the window non-resizable
@@ -321,20 +579,104 @@ class TestSettings:
         self.tests_content_frame = content_frame
         self.tests_content_frame.lift()
 
+        # A new window needs new views.
+        self.shown_view = None
+        self.all_tests_view = None
+        self.options_views = {} # Maps test_name (str) to (view, details_content_frame).
+
         # Display all options as buttons
         self.show_all_tests()
 
+        # One scrollable canvas, shared by every test's options.
+        self.create_details_canvas(width=width - 25, height=height)
+
+        # The mouse wheel binding is app-wide, so remove it along with the window.
+        self.test_settings_window.protocol("WM_DELETE_WINDOW", self.close_test_settings_window)
+
+    def close_test_settings_window(self):
+        self.test_settings_window.unbind_all("<MouseWheel>")
+        self.test_settings_window.destroy()
+
+    def create_details_canvas(self, width, height):
+        ##### CREATE scrollable frame for options #####
+        self.details_frame = tk.Frame(self.tests_content_frame, width=width, height=height)
+
+        details_canvas = tk.Canvas(self.details_frame, width=width, height=height)
+        details_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # Scrollbar:
+        scrollbar = tk.Scrollbar(self.details_frame, orient=tk.VERTICAL, command=details_canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        details_canvas.configure(yscrollcommand=scrollbar.set)
+
+        details_canvas.bind("<Configure>", lambda event: self.bind_scrollable(event, details_canvas))
+
+        # Wheel events go to the widget under the cursor (usually an option's child widget, not the canvas),
+        # so bind once for the whole app, and only scroll for events inside the settings window while the options are on screen.
+        details_canvas.bind_all("<MouseWheel>", self.on_details_mousewheel)
+
+        # Scrollable region. Shows one test's details_content_frame at a time (see show_options).
+        self.details_window = details_canvas.create_window((0, 0), anchor="nw")
+        self.details_canvas = details_canvas
+
+    def on_details_mousewheel(self, event):
+        # event.widget can be a plain path string for Tk-internal widgets (e.g. a combobox dropdown); ignore those.
+        if not isinstance(event.widget, tk.Misc) or event.widget.winfo_toplevel() is not self.test_settings_window:
+            return # Wheel over the main window (e.g. its log textbox) shouldn't scroll the options.
+
+        if self.details_canvas.winfo_ismapped():
+            self.mousewheel_scroll(event, self.details_canvas)
+
     def clear_frame(self, content_frame):
         # Destroy all child widgets and frames recursively
         for widget in content_frame.winfo_children():
             widget.destroy()
 
+    def show_view(self, view):
+        """
+        A view is a list of (widget, pack options) in tests_content_frame.
+        Hides the currently shown view and packs the given one, without rebuilding either.
+        """
+        if self.shown_view is not None:
+            for widget, _ in self.shown_view:
+                widget.pack_forget()
+
+        for widget, pack_options in view:
+            widget.pack(**pack_options)
+
+        self.shown_view = view
+
+    # Discard a test's cached options view, so it is rebuilt with the test's current options.
+    def forget_options_view(self, test_name):
+        options_view = self.options_views.pop(test_name, None)
+
+        if options_view is not None:
+            view, details_content_frame = options_view
+
+            if view is self.shown_view:
+                self.show_view([]) # Hides the shared details_frame too.
+
+            header_frame, _ = view[0]
+            header_frame.destroy()
+            details_content_frame.destroy() # The shared details_frame is kept.
+
     def show_all_tests(self):
-        self.clear_frame(self.tests_content_frame)
+        if self.all_tests_view is None:
+            self.all_tests_view = self.create_all_tests_view()
+
+        # Refill the test names, as tests may have been added or deleted since last shown.
+        self.all_tests_listbox.delete(0, tk.END)
+
+        # Insert all names in one call; rows default to the listbox's white bg, so only odd rows need a color.
+        self.all_tests_listbox.insert(tk.END, *self.all_tests)
+        for i in range(1, self.all_tests_listbox.size(), 2):
+            self.all_tests_listbox.itemconfig(i, bg="#c8e4f0")
+
+        self.show_view(self.all_tests_view)
 
+    def create_all_tests_view(self):
         # [TOP FRAME] Allow users to create new tests.
         top_frame = tk.Frame(self.tests_content_frame)
-        top_frame.pack(side=tk.TOP)
 
         new_test_label = tk.Label(top_frame, text='Enter name for new test: ')
         new_test_label.pack(side=tk.TOP, anchor=tk.W)
@@ -347,10 +689,9 @@ class TestSettings:
 
         # [BOTTOM FRAME] Add buttons to allow navigation to each Test.
         bottom_frame = tk.Frame(self.tests_content_frame)
-        bottom_frame.pack(side=tk.TOP)
 
         # Create a Listbox widget to hold the test names
-        test_listbox = tk.Listbox(bottom_frame, height=10, width=50)
+        test_listbox = tk.Listbox(bottom_frame, height=10, width=50, bg="#FFFFFF")
         test_listbox.pack(side=tk.LEFT, fill=tk.Y)
 
         # Create a Scrollbar widget and attach it to the Listbox
@@ -359,20 +700,17 @@ class TestSettings:
         scrollbar.config(command=test_listbox.yview)
 
         test_listbox.config(yscrollcommand=scrollbar.set)
-
-        colors = ["#FFFFFF", "#c8e4f0"]
-        for i, test_name in enumerate(self.all_tests):
-            test_listbox.insert(tk.END, test_name)
-            test_listbox.itemconfig(tk.END, bg=colors[i%2])
         
         test_listbox.bind("<<ListboxSelect>>", lambda event: self.on_test_selected(event))
+        self.all_tests_listbox = test_listbox
+
+        return [(top_frame, {"side": tk.TOP}), (bottom_frame, {"side": tk.TOP})]
     
     def on_add_test(self, event=None):
         test_name = self.new_test_entry.get() 
 
         if (self.create_new_test(test_name=test_name, option_title="Opt. 1")):
-            test_listbox = self.tests_content_frame.winfo_children()[1].winfo_children()[0] 
-            test_listbox.insert(tk.END, test_name)
+            self.all_tests_listbox.insert(tk.END, test_name)
             
             self.new_test_entry.delete(0, tk.END) # Clear entry
 
@@ -384,9 +722,26 @@ class TestSettings:
             self.show_options(test_name=selected_test_name)
 
     def show_options(self, test_name : str):
-        self.clear_frame(content_frame=self.tests_content_frame)
-        self.show_test_header(test_name=test_name)
-        self.show_test_options(test_name=test_name)
+        if test_name not in self.options_views:
+            test = self.all_tests[test_name] # Look the Test up once, for the header and the options.
+
+            header_frame = tk.Frame(self.tests_content_frame)
+            self.show_test_header(content_frame=header_frame, test=test)
+
+            details_content_frame = tk.Frame(self.details_canvas)
+            self.show_test_options(details_content_frame=details_content_frame, current_test=test)
+
+            view = [(header_frame, {"fill": tk.X}), (self.details_frame, {"fill": tk.BOTH, "expand": True})]
+            self.options_views[test_name] = (view, details_content_frame)
+
+        view, details_content_frame = self.options_views[test_name]
+
+        # Swapping in a cached frame does not resize it, so also refresh the scroll region here.
+        self.details_canvas.itemconfigure(self.details_window, window=details_content_frame)
+        self.details_canvas.yview_moveto(0)
+        self.details_canvas.after_idle(lambda: self.bind_scrollable(None, self.details_canvas))
+
+        self.show_view(view)
     
     def update_prompt(self, test_name: str, new_prompt: str):
         if new_prompt == '' or test_name not in self.all_tests:
@@ -395,9 +750,11 @@ class TestSettings:
         self.all_tests[test_name].action_prompt = new_prompt
         return True
 
-    def show_test_header(self, test_name, header_x_padding=5, header_y_padding=1, bg="lightblue"):
+    def show_test_header(self, content_frame, test: Test, header_x_padding=5, header_y_padding=1, bg="lightblue"):
+        test_name = test.name
+
         # Create the header frame
-        header_frame = tk.Frame(self.tests_content_frame, width=200, bg=bg)
+        header_frame = tk.Frame(content_frame, width=200, bg=bg)
         header_frame.pack(fill=tk.X)
 
         # For sorting sections of the header frame
@@ -428,15 +785,15 @@ class TestSettings:
         )
 
         delete_test_button.pack(side=tk.RIGHT, anchor="e")
-        delete_test_button.bind("<Button-1>",lambda event: self.delete_test(test=test_name))
+        delete_test_button.bind("<Button-1>",lambda event: self.delete_test(test_name=test_name))
 
         # Create the entry and update prompt button
         self.curr_action_prompt = tk.StringVar()
         prompt_entry = tk.Entry(middle_frame, textvariable=self.curr_action_prompt, width=15)
-        prompt_entry.insert(tk.END, self.all_tests[test_name].action_prompt)
+        prompt_entry.insert(tk.END, test.action_prompt)
         prompt_entry.pack(side=tk.LEFT)
 
-        prompt_button = tk.Button(middle_frame, text='Update Prompt', anchor="nw", command=lambda: self.update_prompt(prompt_entry.get(), test_name))
+        prompt_button = tk.Button(middle_frame, text='Update Prompt', anchor="nw", command=lambda: self.update_prompt(test_name=test_name, new_prompt=prompt_entry.get()))
         prompt_button.pack(side=tk.LEFT, pady=header_y_padding, padx=header_x_padding)
 
         # Create button to create a new option for the current test
@@ -453,42 +810,17 @@ class TestSettings:
             lambda event: self.create_new_option(test_name=test_name),
         )
 
-    def show_test_options(self, test_name : str, bg = "#c8e4f0"):
-        width = self.test_settings_window.winfo_width() - 25
-        height = self.test_settings_window.winfo_height()
-
-        ##### CREATE scrollable frame for options #####
-        details_frame = tk.Frame(self.tests_content_frame, width=width, height=height)
-        details_frame.pack(fill=tk.BOTH, expand=True)
-
-        details_canvas = tk.Canvas(details_frame, width=width, height=height)
-        details_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        # Scrollbar:
-        scrollbar = tk.Scrollbar(details_frame, orient=tk.VERTICAL, command=details_canvas.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        details_canvas.configure(yscrollcommand=scrollbar.set)
-
-        details_canvas.bind("<Configure>", lambda event: self.bind_scrollable(event, details_canvas))
-        details_canvas.bind_all("<MouseWheel>", lambda event: self.mousewheel_scroll(event, details_canvas))
-
-        details_content_frame = tk.Frame(details_canvas)
-        
-        # Scrollable region
-        details_canvas.create_window((0, 0), window=details_content_frame, anchor="nw")
-        details_content_frame.bind("<Configure>", lambda event: self.bind_scrollable(event, details_canvas))
+    # Fills details_content_frame (a child of the shared details_canvas) with the test's options.
+    def show_test_options(self, details_content_frame, current_test: Test, bg = "#c8e4f0"):
+        details_content_frame.bind("<Configure>", lambda event: self.bind_scrollable(event, self.details_canvas))
 
         ##### FILL options with details #####
         # Get the details for the selected test
-        current_test = self.all_tests[test_name]
+        test_name = current_test.name
 
         option_frame_width = 150
-        num_options = 0
         # Display each option for the test
-        for _, option_name in enumerate(current_test.options):
-            num_options += 1
-            option = current_test.options[option_name]
-
+        for option in current_test.options.values():
             option_frame = tk.Frame( # Create a frame for each option
                 details_content_frame,
                 relief="solid",
@@ -510,33 +842,40 @@ class TestSettings:
             delete_option_icon.pack(anchor="ne", pady=1, padx=10)
             delete_option_icon.bind(
                 "<Button-1>",
-                lambda event: self.delete_option(test_name=current_test.name, option_name=option_name),
+                # Bind the name now; a plain closure would see the loop's last option.
+                lambda event, option_name=option.name: self.delete_option(test_name=current_test.name, option_name=option_name),
             )
 
-            entries = []
-            for label, value in option.get_vals(): # Add each value for the current option. 
-                entry = self.add_box_detail(option_frame=option_frame, label=label, value=value, bg=bg)
-                entries.append(entry)
+            value_getters = []
+            for attr, label, value in option.get_vals(): # Add each value for the current option. 
+                get_value = self.add_box_detail(option_frame=option_frame, attr=attr, label=label, value=value, bg=bg)
+                value_getters.append(get_value)
 
             save_button = tk.Button(
                 option_frame,
                 text="Save",
-                command=lambda entries=entries, test_name=test_name: self.save_updated_values(
-                    test_name=test_name,
-                    option_title=entries[0].get("1.0", "end-1c"),
-                    explanation=entries[1].get("1.0", "end-1c"),
-                    relax_time=entries[2].get("1.0", "end-1c"),
-                    action_time=entries[3].get("1.0", "end-1c"),
-                    loop_times=entries[4].get("1.0", "end-1c"),
+                command=lambda value_getters=value_getters, test_name=test_name: self.on_save_option(
+                    test_name=test_name, value_getters=value_getters
                 ),
             )
             save_button.pack(anchor="n", padx=option_frame_width)
 
         self.add_padding(content_frame=details_content_frame, bg="lightblue", text='[END]', font=("Arial", 10, "bold"))
 
-        if (num_options > 1):
+        if (current_test.num_of_options() > 1):
             self.add_padding(content_frame=details_content_frame, line_count=5)
 
+    # value_getters are in TestOption.get_vals order (see add_box_detail).
+    def on_save_option(self, test_name, value_getters):
+        try:
+            option_title, explanation, action_time, relax_time, loop_times = (get_value() for get_value in value_getters)
+
+        except (tk.TclError, ValueError): # A numeric entry holds something that is not a number.
+            messagebox.showerror("Invalid value", "Action time, relax time and loop count must be numbers.")
+            return False
+
+        return self.save_updated_values(test_name=test_name, option_title=option_title, explanation=explanation, 
+                                        relax_time=relax_time, action_time=action_time, loop_times=loop_times)
 
     # Use entry to update variable values
     def save_updated_values(self, test_name, option_title, explanation, relax_time, action_time, loop_times):
@@ -551,8 +890,12 @@ class TestSettings:
         else:
             logging.warning('save_updated_values failed.')
 
-    # Insert details for specific option
-    def add_box_detail(self, option_frame, label: str, value, entry_width=40, bg=None):
+        return updated
+
+    # Insert details for specific option. Returns a function that reads the (edited) value back.
+    def add_box_detail(self, option_frame, attr: str, label: str, value, entry_width=40, bg=None):
+        variable_type = self.NUMERIC_DETAILS.get(attr)
+
         label = tk.Label(
             option_frame,
             text=label,
@@ -562,6 +905,14 @@ class TestSettings:
         )
         label.pack(anchor="w")
 
+        if variable_type is not None:
+            variable = variable_type(master=option_frame, value=value)
+
+            entry = tk.Entry(option_frame, width=entry_width, textvariable=variable)
+            entry.pack(anchor="w", expand=True)
+
+            return variable.get
+
         value_text = str(value)
         height = len(value_text) / (entry_width / 1.5)
 
@@ -571,7 +922,7 @@ class TestSettings:
         entry.insert(tk.END, value_text)
         entry.pack(anchor="w", expand=True)
 
-        return entry
+        return lambda: entry.get("1.0", "end-1c")
 
     # Helper method: Add extra lines to canvas
     def add_padding(self, content_frame, line_count=1, bg=None, text='', font=None):
@@ -591,9 +942,13 @@ class TestSettings:
         self.menubar.entryconfigure(1, state=tk.DISABLED)
 
     def enable_settings(self):
-        self.menubar.entryconfigure(1, state=tk.DISABLED)
+        if self.config_loaded: # Otherwise apply_loaded_config enables them, once loading is done.
+            self.menubar.entryconfigure(1, state=tk.NORMAL)
 
 class DataCollectionGUI:
+    # Start button (text, color) for each run state (see set_run_state).
+    RUN_STATE_STYLE = {"idle": ("Start", "green"), "active": ("Stop", "red")}
+
     def __init__(self, dir=None):
         self.WINDOW_HEADER_BG = '#eaebec'
 
@@ -632,15 +987,17 @@ class DataCollectionGUI:
         self.timer_value = tk.Label(self.top_frame, text="00:00:00", bg=self.WINDOW_HEADER_BG)
         self.timer_value.pack(side=tk.LEFT, padx=5)
 
-        # Start button
+        # Start button. Its text and color follow self.run_state (see set_run_state), rather than being read back from the widget.
         self.start_button = tk.Button(
             self.top_frame, text="Start", command=self.start
         )
         self.start_button.pack(side=tk.RIGHT, padx=10)
+        self.set_run_state("idle")
         self.start_button.config(state="disabled") # Can't start before choosing file.
 
         # Configure menu bar
-        self.testSettings = TestSettings(dir=dir, root=self.root)
+        self.testSettings = TestSettings(dir=dir, root=self.root, on_load=self.on_tests_loaded)
+        self.status_value.config(text="Loading tests...")
 
         ### (Middle Frame) Add dropdown boxes ### 
         self.middle_frame = tk.Frame(self.root, bg=self.WINDOW_HEADER_BG)
@@ -655,11 +1012,6 @@ class DataCollectionGUI:
             self.middle_frame, textvariable=self.t_variable, state="readonly"
         )
 
-        t_list = list(self.test_dropdown["values"])
-        for test_name in self.testSettings.all_tests:
-            t_list.append(str(test_name)) # Tuples are immutable, so utilize a list.
-
-        self.test_dropdown["values"] = tuple(t_list)
         self.test_dropdown.pack(side=tk.LEFT, padx=5)
 
         # Right dropdown: Select Option:
@@ -685,7 +1037,7 @@ class DataCollectionGUI:
 
         self.filename_entry = tk.Entry(bottom_frame, width=45)
         self.filename_entry.pack(side=tk.LEFT, padx=5)
-        self.filename_entry.bind("<KeyRelease>", self.update_file_entry)
+        self.filename_entry.bind("<KeyRelease>", self.enable_start_if_ready)
 
         or_label = tk.Label(bottom_frame, text=" OR:", bg=self.WINDOW_HEADER_BG)
         or_label.pack(side=tk.LEFT)
@@ -717,14 +1069,20 @@ class DataCollectionGUI:
         self.scrollbar.config(command=self.text_box.yview)
 
         # Print first messages to text box
-        self.insert_text(text_box=self.text_box, txt='Socket not connected.\n', tag='blue')
-        self.insert_text(text_box=self.text_box, txt='Enter filename and press Start to begin.\n', tag='blue')
+        self.insert_batch(text_box=self.text_box, parts=[
+            ('Socket not connected.\n', 'blue'),
+            ('Enter filename and press Start to begin.\n', 'blue'),
+        ])
 
         # Connection variables: 
         self.socket = None
         self.TCP_IP = "localhost"
         self.TCP_PORT = 8844
+        self.socket_reader = None # Buffered reader over self.socket, set in open_socket.
+        self.socket_thread = None # Runs socket_loop.
         self.timer_running = False
+        self.timer_after_id = None # Pending timer_tick.
+        self.timer_deadline = None
         self.socket_running = False
         self.time_point_set = False
         self.start_time_stamp = None
@@ -734,6 +1092,13 @@ class DataCollectionGUI:
         self.seconds = 0
         self.minutes = 0
         self.prompt_dictionary = None
+        self.prompt_events = deque() # (time, prompt) pairs still to show, sorted by time. Set with prompt_dictionary.
+
+        # Tk isn't thread-safe, so the socket thread never touches widgets itself: it queues the updates,
+        # and the Tk main loop runs them (see run_on_ui and drain_ui_queue). deque append/popleft are thread-safe.
+        self.ui_queue = deque()
+        self.root.after(50, self.drain_ui_queue)
+
         self.DSI_EVENT_CODES = {
             1: "Greeting/Version",
             2: "Data Start",
@@ -746,6 +1111,23 @@ class DataCollectionGUI:
             9: "Sensor Map",
             10: "Data Rate",
         }
+
+        # Packet layout (big-endian). Precompiled once, and read with unpack_from so packets aren't sliced.
+        self.DATA_LENGTH_STRUCT = struct.Struct(">H") # Header: at byte 6. (The packet type is the single byte 5.)
+        self.TIME_STAMP_STRUCT = struct.Struct(">f") # Data packets: at byte 12.
+        self.EVENT_CODE_STRUCT = struct.Struct(">I") # Event packets: at byte 12.
+        self.EEG_DATA_STRUCT = struct.Struct(">25f") # From byte 23.
+
+        # One CSV row per data packet: the time stamp, then the 25 EEG values. (%r writes floats exactly as str() does.)
+        self.CSV_ROW_FORMAT = ",".join(["%r"] * 26) + "\n"
+        self.CSV_BATCH_SIZE = 64 # Data rows collected per file write.
+        self.csv_rows = []
+
+        # Packet type -> handler (called with the whole packet). Other types are reserved.
+        self.PACKET_HANDLERS = {
+            1: self.handle_data_packet,
+            5: self.handle_event_packet,
+        }
         
     def scroll_textbox_to_end(self):
         self.text_box.see(tk.END)
@@ -759,18 +1141,33 @@ class DataCollectionGUI:
         self.socket_running = False
         self.timer_running = False
 
-        try:
-            self.socket.close()
-        except:
-            pass
+        if self.socket_thread is not None and self.socket_thread.is_alive():
+            # The socket thread may be waiting in a read (e.g. connected but not streaming yet). Shutting the socket down
+            # ends that read, and the thread then closes the socket itself. Closing it from here instead would block on
+            # the reader's lock, which the waiting read holds.
+            self.shutdown_socket()
+            self.socket_thread.join(timeout=5)
 
-        try:
-            self.file.close()
-        except:
-            pass
+        else:
+            try:
+                self.close_socket()
+            except:
+                pass
+
+        # The data file is written and closed only by the socket thread, at the end of socket_loop.
+
+        self.testSettings.flush_if_dirty() # Don't lose edits still waiting to be saved.
 
         self.root.destroy()  # Close the window
     
+    # Called (on the Tk main thread) once TestSettings has finished loading the config file.
+    def on_tests_loaded(self):
+        self.update_test_dropdown()
+        self.status_value.config(text="Waiting to begin..." if self.testSettings.all_tests else "No tests loaded.")
+
+    def update_test_dropdown(self):
+        self.test_dropdown["values"] = tuple(self.testSettings.all_tests) # Only the names; no Test is built.
+
     def update_options_dropdown(self, *_args):
         selected_test_name = self.t_variable.get()
 
@@ -780,7 +1177,7 @@ class DataCollectionGUI:
             self.options_dropdown["values"] = tuple(options)
 
             # By default, select the first option (a Test should have 1+ options).
-            self.opt_variable.set(next(iter(options)) if options else "")
+            self.opt_variable.set(self.testSettings.first_option(selected_test_name))
 
             self.toggle_start_button()
     
@@ -838,20 +1235,32 @@ class DataCollectionGUI:
 
         # For appending selected test and option to the name.
         self.tail = f"{tail_indicator}{curr_test}_{curr_opt}"
+        self.tail = self.tail.replace(" ", "_") 
 
         # Append file count (to deal with identically named files).
+        # One directory scan finds the highest existing count, instead of checking each count in turn.
+        counter_re = re.compile(re.escape(f"{self.file_name}{self.tail}_") + r"(\d+)" + re.escape(self.file_extension) + "$")
+
         counter = 1
-        while os.path.exists(os.path.join(self.file_dir, f"{self.file_name}{self.tail}_{counter}")):
-            counter += 1
+        try:
+            with os.scandir(self.file_dir) as dir_entries:
+                for entry in dir_entries:
+                    match = counter_re.match(entry.name)
+                    if match:
+                        counter = max(counter, int(match.group(1)) + 1)
+
+        except OSError: # E.g. the directory does not exist yet.
+            pass
         
         self.tail = f"{self.tail}_{counter}"
-        self.tail = self.tail.replace(" ", "_") 
 
         # Update full_path to reflect changes.
         self.full_path = os.path.join(self.file_dir, f"{self.file_name}{self.tail}{self.file_extension}")
 
     
     def toggle_start_button(self):
+        # Each widget is read once (every get is a call into Tk); stops at the first empty field.
+        # Only enables/disables: the button's text and color are set with the run state (see set_run_state).
         if (self.full_path != "" and self.filename_entry.get() != "" and
             self.test_dropdown.get() != "" and self.options_dropdown.get() != ""):
 
@@ -859,15 +1268,18 @@ class DataCollectionGUI:
 
         else:
             self.start_button.configure(state="disabled")
-        
 
-        button_text = self.start_button.cget("text")
-        if button_text.lower() == "start":
-            self.start_button.config(text="Start", foreground="green")
+    # run_state is "idle" (button shows Start) or "active" (collecting; button shows Stop). start() reads it to decide which to do.
+    def set_run_state(self, run_state):
+        self.run_state = run_state
 
-        elif button_text.lower() == "stop":
-            self.start_button.config(text="Stop", foreground="red")
+        text, color = self.RUN_STATE_STYLE[run_state]
+        self.start_button.config(text=text, foreground=color)
     
+    # Cheap enough for every keystroke: the filename itself is only worked out on Start (see start()).
+    def enable_start_if_ready(self, event=None):
+        self.toggle_start_button()
+
     def update_file_entry(self, event=None, new_filename=None, new_full_path=None):            
         self.update_filename(new_filename=new_filename, new_full_path=new_full_path)
 
@@ -879,7 +1291,7 @@ class DataCollectionGUI:
         self.toggle_start_button()
     
     def restart(self):
-        self.start_button.config(text="Start", foreground="green")
+        self.set_run_state("idle")
         self.set_button_state(state="normal")
         self.testSettings.enable_settings()
 
@@ -911,10 +1323,27 @@ class DataCollectionGUI:
         
         self.prompt_dictionary[last_timestamp + option.relax_time] = RELAX_PROMPT
 
+        # The prompts still to show, in order of time: the timer only has to check the first one each second.
+        # (The time 0 prompt is the starting state, shown before the timer starts, so it isn't queued.)
+        self.prompt_events = deque(sorted(
+            (prompt_time, prompt) for prompt_time, prompt in self.prompt_dictionary.items() if prompt_time > 0 and prompt is not None
+        ))
+
         # Return collection duration
         collection_duration = list(self.prompt_dictionary.keys())[-1]
         return collection_duration
     
+    # Safe to call from any thread: fn(*args, **kwargs) is run later on the Tk main loop.
+    def run_on_ui(self, fn, *args, **kwargs):
+        self.ui_queue.append((fn, args, kwargs))
+
+    def drain_ui_queue(self):
+        self.root.after(50, self.drain_ui_queue) # Reschedule first, so one failing update doesn't stop the draining.
+
+        while self.ui_queue:
+            fn, args, kwargs = self.ui_queue.popleft()
+            fn(*args, **kwargs)
+
     def insert_text(self, text_box, txt, tag=''):
         if not txt.endswith('\n'):
             txt += '\n'
@@ -922,10 +1351,26 @@ class DataCollectionGUI:
         text_box.insert(tk.END, txt, tag)
         text_box.see(tk.END)
 
+    # insert_text for several (txt, tag) parts at once: one Tk insert call (it takes text, tag pairs), and one scroll.
+    def insert_batch(self, text_box, parts):
+        args = []
+        for txt, tag in parts:
+            args += [txt if txt.endswith('\n') else txt + '\n', tag]
+
+        text_box.insert(tk.END, *args)
+        text_box.see(tk.END)
+
+    # The Start/Stop button: starts a collection when idle, stops the active one otherwise.
     def start(self):
+        starting = self.run_state == "idle"
+
+        if starting:
+            # Work out the final filename (and its file count) now, before the entry is disabled.
+            self.update_file_entry()
+
         self.set_button_state("disabled")
 
-        if not self.socket_running:
+        if starting:
             if self.open_socket() == False:
                 self.insert_text(self.text_box, txt='Connection Refused!\n ABORTING...\n', tag='red')
 
@@ -934,33 +1379,41 @@ class DataCollectionGUI:
         
             # Clear the Textbox, then add confirmation message. 
             self.text_box.delete("1.0", tk.END)
-            self.insert_text(self.text_box, txt='Socket connected.\n\n', tag='green')
- 
             # Print file directory:
-            self.insert_text(self.text_box, txt='File Name: ', tag='black')
-            self.insert_text(self.text_box, txt=f"{self.file_name}{self.tail}_{self.file_extension}\n", tag='blue')
-            self.insert_text(self.text_box, txt=f"File Directory: \n", tag='black')
-            self.insert_text(self.text_box, txt=f"{self.file_dir}\n\n", tag='blue')
-
-            self.file = open(self.full_path, "w")
+            self.insert_batch(self.text_box, parts=[
+                ('Socket connected.\n\n', 'green'),
+                ('File Name: ', 'black'),
+                (f"{self.file_name}{self.tail}_{self.file_extension}\n", 'blue'),
+                (f"File Directory: \n", 'black'),
+                (f"{self.file_dir}\n\n", 'blue'),
+            ])
+
+            # Large write buffer: rows arrive in many small writes, so let them collect before going to disk.
+            # (Flushed when the socket thread closes the file, at the end of socket_loop.)
+            self.file = open(self.full_path, "w", buffering=1 << 20)
+            self.csv_rows = []
 
             # Timing: @TODO: Replace using a list. 
             self.collection_duration = self.determine_collection_duration()
 
             # Start socket loop:
             self.socket_running = True
-            threading.Thread(target=self.socket_loop).start()
+            self.socket_thread = threading.Thread(target=self.socket_loop)
+            self.socket_thread.start()
 
             # Upgrade status labels: 
             self.status_label.config(text="Active")
-            self.start_button.config(text="Stop", foreground="red")
+            self.set_run_state("active")
         
-        else: # if socket_running = True
-            self.socket_running = False
-            self.timer_running = False
+        else: # run_state is "active"
+            self.stop_collection()
+
+    def stop_collection(self):
+        self.socket_running = False
+        self.timer_running = False
 
-            self.insert_text(self.text_box, txt='Collection ending...\n')
-            self.restart()
+        self.insert_text(self.text_box, txt='Collection ending...\n')
+        self.restart()
 
     def set_button_state(self, state: str):
         """
@@ -980,7 +1433,10 @@ class DataCollectionGUI:
     
     def open_socket(self):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024)
+        # Room for a few seconds of packets, so a pause on our side (e.g. the GUI busy) doesn't stall the stream.
+        # Set before connect; the OS may cap it (on Linux, at net.core.rmem_max), so log what was actually given.
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        logging.info(f"Socket receive buffer: {self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} bytes.")
 
         try:
             self.socket.connect((self.TCP_IP, self.TCP_PORT))
@@ -988,148 +1444,224 @@ class DataCollectionGUI:
         except:
             return False
         
+        self.socket_reader = self.socket.makefile('rb', buffering=1 << 16)
         return True
+
+    # Safe to call from any thread: wakes a read waiting on the socket (it then reads EOF).
+    def shutdown_socket(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError: # Already closed, or never connected.
+            pass
+
+    # Only from the thread reading the socket (or when nothing is reading it), since closing the reader waits for a read in progress.
+    def close_socket(self):
+        # The socket is only really closed once its reader is closed too.
+        if self.socket_reader is not None:
+            self.socket_reader.close()
+            self.socket_reader = None
+
+        self.socket.close()
     
+    # Runs on its own thread: widgets are only updated through run_on_ui.
     def socket_loop(self):
-        while self.socket_running: 
-            if not self.receive_and_handle_data(): # Get the Packet Header
-                break
+        try:
+            while self.socket_running: 
+                if not self.receive_and_handle_data(): # Get the Packet Header
+                    break
 
-        backlog_packet_counter = 0
+            backlog_packet_counter = 0
 
-        if (self.last_time_stamp - self.start_time_stamp) < float(self.collection_duration):
-            self.insert_text(self.text_box, txt='Capturing Backlog Data from DSI!\n')
-            self.insert_text(self.text_box, txt='Do not close the window or the DSI-Streamer, \nor data will be lost!\n', tag='orange')
+            # Without any data packet (e.g. stopped or closed before Data Start) there are no time stamps and no backlog.
+            received_data = self.start_time_stamp is not None
 
-            self.set_button_state("disabled")
+            if received_data and (self.last_time_stamp - self.start_time_stamp) < float(self.collection_duration):
+                self.run_on_ui(self.insert_text, self.text_box, txt='Capturing Backlog Data from DSI!\n')
+                self.run_on_ui(self.insert_text, self.text_box, txt='Do not close the window or the DSI-Streamer, \nor data will be lost!\n', tag='orange')
 
-        self.backlog_time_stamp = self.last_time_stamp
+                self.run_on_ui(self.set_button_state, "disabled")
 
-        while self.last_time_stamp - self.start_time_stamp < float(self.collection_duration):
-            if not self.receive_and_handle_data():
-                break
+            self.backlog_time_stamp = self.last_time_stamp
 
-            backlog_packet_counter = backlog_packet_counter + 1
+            while received_data and self.last_time_stamp - self.start_time_stamp < float(self.collection_duration):
+                if not self.receive_and_handle_data():
+                    break
 
-        self.socket.close()
-        self.file.close()
+                backlog_packet_counter = backlog_packet_counter + 1
 
-        self.insert_text(self.text_box, txt="Received {:.2f} seconds of Backlog from DSI!\n".format(self.last_time_stamp - self.backlog_time_stamp))
-        self.insert_text(self.text_box, txt="Collection began at {:.2f} seconds\n".format(self.start_time_stamp))
-        self.insert_text(self.text_box, txt="Backlog began at {:.2f} seconds\n".format(self.backlog_time_stamp))
-        self.insert_text(self.text_box, txt="Backlog ended at {:.2f} seconds\n".format(self.last_time_stamp))        
+        finally:
+            # Only this thread writes the data file, so the last batch of rows is never written or lost from two threads.
+            self.close_socket()
+            self.write_csv_rows()
+            self.file.close()
+
+        if received_data:
+            self.run_on_ui(self.insert_text, self.text_box, txt="Received {:.2f} seconds of Backlog from DSI!\n".format(self.last_time_stamp - self.backlog_time_stamp))
+            self.run_on_ui(self.insert_text, self.text_box, txt="Collection began at {:.2f} seconds\n".format(self.start_time_stamp))
+            self.run_on_ui(self.insert_text, self.text_box, txt="Backlog began at {:.2f} seconds\n".format(self.backlog_time_stamp))
+            self.run_on_ui(self.insert_text, self.text_box, txt="Backlog ended at {:.2f} seconds\n".format(self.last_time_stamp))        
 
         self.start_time_stamp = None
         self.last_time_stamp = None
-        self.insert_text(self.text_box, txt='Data Collection Loop Ending!\n', tag='green')
+        self.run_on_ui(self.insert_text, self.text_box, txt='Data Collection Loop Ending!\n', tag='green')
 
-        self.set_button_state("normal")
-        self.start_button.config(state="normal")
-        self.start_button.config(text="Start")
+        self.run_on_ui(self.stop_timer) # E.g. the stream ended by itself: its timer must not run on (or expire) after this.
+        self.run_on_ui(self.set_button_state, "normal")
+        self.run_on_ui(self.set_run_state, "idle")
+        self.run_on_ui(self.start_button.config, state="normal")
 
-    def time_loop(self):
+    # Runs on the Tk main loop (queued by the socket thread on the Data Start event).
+    def start_timer(self):
         self.text_box.tag_configure('bg_lightblue', background='#c8e4f0')
 
-        while self.timer_running:
-            self.seconds += 1
-            if self.seconds == 60:
-                self.seconds = 0
-                self.minutes += 1
-
-            time_string = "{:02d}:{:02d}".format(self.minutes, self.seconds)
-            self.timer_value.config(text=time_string)
-
-            if (self.seconds in self.prompt_dictionary and self.prompt_dictionary[self.seconds] is not None):
-                prompt = self.prompt_dictionary[self.seconds]
-                text = "{:02d}: {}".format(self.seconds, prompt)
+        if self.timer_after_id is not None: # A previous collection's tick may still be pending.
+            self.root.after_cancel(self.timer_after_id)
 
-                if prompt != RELAX_PROMPT:
-                    bg = 'bg_lightblue'
-                else:
-                    bg = ''
+        self.seconds = 0
+        self.minutes = 0
+        self.timer_running = True
 
-                self.insert_text(self.text_box, txt=text, tag=bg)
+        self.timer_deadline = time.monotonic()
+        self.timer_tick()
 
-            time.sleep(1) # second
+    # Runs on the Tk main loop. Cancels the pending tick, so the timer stops straight away.
+    def stop_timer(self):
+        self.timer_running = False
 
-            if self.seconds == self.collection_duration:
-                self.insert_text(text_box=self.text_box, txt='\nTimer Expired!\n')
-                self.start()
+        if self.timer_after_id is not None:
+            self.root.after_cancel(self.timer_after_id)
+            self.timer_after_id = None
 
         self.seconds = 0
         self.minutes = 0
 
-    def recvall(self, count):
-        # Keep receiving data until we have received the requested number of bytes
+    # One second of the timer, scheduled with root.after (no thread, so the widgets are only touched from the Tk main loop).
+    def timer_tick(self):
+        self.timer_after_id = None
+
+        # Total seconds, and >= since the duration can be fractional (or the timer past a minute).
+        if self.timer_running and self.minutes * 60 + self.seconds >= self.collection_duration:
+            self.insert_text(text_box=self.text_box, txt='\nTimer Expired!\n')
+
+            # Stop the timer first and then the collection, explicitly: a tick must never start a collection.
+            self.timer_running = False
+            if self.run_state == "active":
+                self.stop_collection()
+
+        if not self.timer_running:
+            self.seconds = 0
+            self.minutes = 0
+            return
+
+        self.seconds += 1
+        if self.seconds == 60:
+            self.seconds = 0
+            self.minutes += 1
+
+        time_string = "{:02d}:{:02d}".format(self.minutes, self.seconds)
+        self.timer_value.config(text=time_string)
+
+        # Show each prompt that is due (total seconds, so prompts after the first minute show too).
+        elapsed = self.minutes * 60 + self.seconds
+        while self.prompt_events and self.prompt_events[0][0] <= elapsed:
+            _, prompt = self.prompt_events.popleft()
+            text = "{:02d}: {}".format(elapsed, prompt)
+
+            if prompt != RELAX_PROMPT:
+                bg = 'bg_lightblue'
+            else:
+                bg = ''
+
+            self.insert_text(self.text_box, txt=text, tag=bg)
+
+        # Schedule against a fixed deadline rather than 'in 1 second', so the time spent in each tick doesn't add up to drift.
+        self.timer_deadline += 1
+        delay_ms = max(0, int((self.timer_deadline - time.monotonic()) * 1000))
+        self.timer_after_id = self.root.after(delay_ms, self.timer_tick)
+
+    def recvall_into(self, view):
+        # Keep reading data straight into view (a memoryview) until it is full.
+        # Returns False if the connection closed or failed first.
         received = 0
-        data = b""
+        count = len(view)
 
-        while received < count: # Receive up to count bytes of data
+        # Read through the buffered reader (see open_socket): one recv from the socket fills its buffer with many
+        # packets, and the header and body reads after that are served from it, without a recv each.
+        while received < count: # Read up to the remaining bytes of data
             try:
-                chunk = self.socket.recv(count - received)
+                num_bytes = self.socket_reader.readinto(view[received:])
             except:
-                return None
+                return False
             
-            if not chunk: # The other end closed the connection
-                return None
+            if not num_bytes: # The other end closed the connection
+                return False
             
-            received += len(chunk)
-            data += chunk
+            received += num_bytes
 
-        return data
+        return True
+
+    def recvall(self, count):
+        # Returns a bytearray of exactly count bytes, or None if the connection ended first.
+        data = bytearray(count)
+        return data if self.recvall_into(memoryview(data)) else None
 
     def receive_and_handle_data(self):
-        data = self.recvall(12)
+        header = self.recvall(12)
 
-        if not data:
-            self.insert_text(text_box=self.text_box, txt='No Data Remaining in Socket!\n')
+        if header is None:
+            self.run_on_ui(self.insert_text, text_box=self.text_box, txt='No Data Remaining in Socket!\n')
             return False
         
         # Get the Packet Type and the Packet Message Length.
-        packet_type = int.from_bytes(data[5:6], byteorder="big", signed=False)
-        data_length = int.from_bytes(data[6:8], byteorder="big", signed=False)
-
-        # Get the Packet Body
-        new_data = self.recvall(data_length)
-        if not new_data:
-            self.insert_text(text_box=self.text_box, txt='No Data Remaining in Socket!\n')
+        packet_type = header[5]
+        data_length = self.DATA_LENGTH_STRUCT.unpack_from(header, 6)[0]
+
+        # Get the Packet Body, received straight into place after the header (so the packet is never concatenated).
+        data = bytearray(12 + data_length)
+        data[:12] = header
+        if not self.recvall_into(memoryview(data)[12:]):
+            self.run_on_ui(self.insert_text, text_box=self.text_box, txt='No Data Remaining in Socket!\n')
             return False
-        data = data + new_data
-
-        if packet_type == 5:
-            # There is useful information in these event packets that is worth saving as comments at the head of the CSV file.
-            event_code = int.from_bytes(data[12:16], byteorder="big", signed=False)
-            if (event_code in self.DSI_EVENT_CODES and self.DSI_EVENT_CODES[event_code] is not None):
-                event_string = self.DSI_EVENT_CODES[event_code]
-
-            else:
-                event_string = "UNKNOWN"
-            
-            self.insert_text(text_box=self.text_box, txt="Event Packet! Type: {}\n".format(event_string))
 
-            if event_code == 2:
-                self.insert_text(text_box=self.text_box, txt='\nBeginning Collection...\n\n', tag='green')
-                self.timer_running = True
-                threading.Thread(target=self.time_loop).start()
-
-        elif packet_type == 1:
-            # logging.info("INFO: Data Packet!")
-            time_stamp = struct.unpack(">f", data[12:16])
-            if self.start_time_stamp == None:
-                self.start_time_stamp = time_stamp[0]
-            self.last_time_stamp = time_stamp[0]
-
-            eeg_data = struct.unpack(">25f", data[23 : len(data)])
-
-            line = str(time_stamp[0]) + "," + ",".join([str(num) for num in eeg_data])
-
-            self.file.write(line)
-            self.file.write("\n")
+        # Data packets are nearly all the traffic, so pick the handler with one lookup rather than an if/elif chain.
+        handle_packet = self.PACKET_HANDLERS.get(packet_type)
+        if handle_packet is not None:
+            handle_packet(data)
 
         else:
-            self.insert_text(textbox=self.text_box, txt='Reserved Packet!\n')
+            self.run_on_ui(self.insert_text, text_box=self.text_box, txt='Reserved Packet!\n')
 
         return True
+
+    def handle_data_packet(self, data):
+        # logging.info("INFO: Data Packet!")
+        time_stamp = self.TIME_STAMP_STRUCT.unpack_from(data, 12)
+        if self.start_time_stamp == None:
+            self.start_time_stamp = time_stamp[0]
+        self.last_time_stamp = time_stamp[0]
+
+        eeg_data = self.EEG_DATA_STRUCT.unpack_from(data, 23)
+
+        # Rows are written to the file in batches, so most packets only append to a list.
+        self.csv_rows.append(self.CSV_ROW_FORMAT % (time_stamp[0], *eeg_data))
+        if len(self.csv_rows) >= self.CSV_BATCH_SIZE:
+            self.write_csv_rows()
+
+    def write_csv_rows(self):
+        # Writes (and clears) the rows waiting in csv_rows. Must run before the file is closed.
+        self.file.write("".join(self.csv_rows))
+        self.csv_rows.clear()
+
+    def handle_event_packet(self, data):
+        # There is useful information in these event packets that is worth saving as comments at the head of the CSV file.
+        event_code = self.EVENT_CODE_STRUCT.unpack_from(data, 12)[0]
+        event_string = self.DSI_EVENT_CODES.get(event_code) or "UNKNOWN"
+        
+        self.run_on_ui(self.insert_text, text_box=self.text_box, txt="Event Packet! Type: {}\n".format(event_string))
+
+        if event_code == 2:
+            self.run_on_ui(self.insert_text, text_box=self.text_box, txt='\nBeginning Collection...\n\n', tag='green')
+            self.run_on_ui(self.start_timer)
         
 gui = DataCollectionGUI(dir=None)
 gui.root.mainloop()